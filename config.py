@@ -47,6 +47,7 @@ TSP_CONFIG = {
     'algorithm': 'nearest_neighbor',  # Algorithm to use for TSP
     'start_lat': 14.663813,  # Default starting latitude (fallback only)
     'start_lon': 121.122687,  # Default starting longitude (fallback only)
+    'two_opt_passes': 20,  # Max 2-opt improvement passes after nearest neighbor (0 = disabled)
 }
 
 # Stop number assignments
@@ -223,7 +223,10 @@ def main():
         max_workers=args.max_workers,
         start_lat=args.start_lat,
         start_lon=args.start_lon,
-        distributor_id=args.distributor_id
+        distributor_id=args.distributor_id,
+        progress_interval=config.PROGRESS_INTERVAL,
+        min_route_size=config.MIN_ROUTE_SIZE,
+        two_opt_passes=config.TSP_CONFIG['two_opt_passes']
     )
 
     # Run pipeline
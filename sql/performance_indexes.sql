@@ -0,0 +1,118 @@
+-- ============================================================================
+-- Performance indexes for the Hierarchical Route Pipeline (SQL Server)
+--
+-- Run once against the pipeline database. Every statement is guarded so the
+-- script can be re-run safely. Verify plans with SET STATISTICS IO ON.
+-- ============================================================================
+
+-- ----------------------------------------------------------------------------
+-- MonthlyRoutePlan_temp: (DistributorID, AgentID, RouteDate) covering index
+--
+-- Used by:
+--   - get_distributors_hierarchy()      GROUP BY DistributorID, AgentID, RouteDate
+--   - enrich_monthly_plan_data()        WHERE DistributorID = ? AND AgentID = ? AND RouteDate = ?
+--   - fill_gaps_with_nearby_prospects() per-route customer counts and the
+--                                       OUTER APPLY TOP 1 route-details lookup
+--   - StopNo UPDATEs                    WHERE ... AND CustNo = ?
+-- Turns the full-table scan behind these into an index seek / ordered stream
+-- aggregate. The route-detail columns are included so the per-gap lookup
+-- needs no key lookup back to the table. An index created by an earlier
+-- version of this script (without them) is rebuilt in place.
+-- ----------------------------------------------------------------------------
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'ix_mrp_temp_dist_agent_date'
+      AND object_id = OBJECT_ID('dbo.MonthlyRoutePlan_temp')
+)
+    CREATE NONCLUSTERED INDEX ix_mrp_temp_dist_agent_date
+        ON dbo.MonthlyRoutePlan_temp (DistributorID, AgentID, RouteDate)
+        INCLUDE (CustNo, StopNo, Name, WD, SalesManTerritory, RouteName, RouteCode, SalesOfficeID);
+ELSE IF NOT EXISTS (
+    SELECT 1 FROM sys.index_columns ic
+    JOIN sys.indexes i ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+    WHERE i.name = 'ix_mrp_temp_dist_agent_date'
+      AND i.object_id = OBJECT_ID('dbo.MonthlyRoutePlan_temp')
+      AND COL_NAME(ic.object_id, ic.column_id) = 'SalesOfficeID'
+)
+    CREATE NONCLUSTERED INDEX ix_mrp_temp_dist_agent_date
+        ON dbo.MonthlyRoutePlan_temp (DistributorID, AgentID, RouteDate)
+        INCLUDE (CustNo, StopNo, Name, WD, SalesManTerritory, RouteName, RouteCode, SalesOfficeID)
+        WITH (DROP_EXISTING = ON);
+GO
+
+-- ----------------------------------------------------------------------------
+-- prospective: filtered barangay index over rows with valid coordinates
+--
+-- Used by:
+--   - enrich_monthly_plan_data()     barangay_code IN (...) AND valid coordinates
+--   - get_unvisited_prospect_pool()  valid coordinates AND NOT EXISTS (custvisit)
+-- Both queries repeat the predicate
+--   latitude IS NOT NULL AND longitude IS NOT NULL AND latitude != 0 AND longitude != 0
+-- The index filter is that same predicate, so the optimizer matches it without
+-- any change to the queries or to the prospective table. Rows without
+-- coordinates are left out of the index, and the barangay search becomes a
+-- covering index seek. Filtered indexes require ANSI_NULLS and
+-- QUOTED_IDENTIFIER ON.
+-- ----------------------------------------------------------------------------
+SET ANSI_NULLS ON;
+SET QUOTED_IDENTIFIER ON;
+GO
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'ix_prospective_barangay_valid_coords'
+      AND object_id = OBJECT_ID('dbo.prospective')
+)
+    CREATE NONCLUSTERED INDEX ix_prospective_barangay_valid_coords
+        ON dbo.prospective (barangay_code)
+        INCLUDE (tdlinx, latitude, longitude, store_name_nielsen)
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+          AND latitude <> 0 AND longitude <> 0;
+GO
+
+-- ----------------------------------------------------------------------------
+-- customer: CustNo covering index for coordinate enrichment
+--
+-- Used by:
+--   - get_customer_coordinates_batch()  CustNo IN (...) -> latitude, longitude, address3
+--   - enrich_monthly_plan_data()        address3 lookup and custype detection
+--   - update_custype_with_join()        EXISTS (... WHERE c.CustNo = m.CustNo)
+-- Every read of customer is keyed on CustNo and touches only these columns, so
+-- the lookups become index seeks that do not go back to the base table.
+-- ----------------------------------------------------------------------------
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'ix_customer_custno_coords'
+      AND object_id = OBJECT_ID('dbo.customer')
+)
+    CREATE NONCLUSTERED INDEX ix_customer_custno_coords
+        ON dbo.customer (CustNo)
+        INCLUDE (latitude, longitude, address3);
+GO
+
+-- ----------------------------------------------------------------------------
+-- prospective / custvisit: keyed lookups by prospect ID
+--
+-- Used by:
+--   - enrich_monthly_plan_data()        custype detection (prospective.tdlinx join)
+--   - update_custype_with_join()        EXISTS (... WHERE p.tdlinx = m.CustNo)
+--   - get_unvisited_prospect_pool() and the barangay prospect search
+--                                       NOT EXISTS / anti-join on custvisit.CustID
+-- Without these, every custype check and "never visited" filter probes a
+-- heap/clustered scan of the source table.
+-- ----------------------------------------------------------------------------
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'ix_prospective_tdlinx'
+      AND object_id = OBJECT_ID('dbo.prospective')
+)
+    CREATE NONCLUSTERED INDEX ix_prospective_tdlinx
+        ON dbo.prospective (tdlinx);
+GO
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'ix_custvisit_custid'
+      AND object_id = OBJECT_ID('dbo.custvisit')
+)
+    CREATE NONCLUSTERED INDEX ix_custvisit_custid
+        ON dbo.custvisit (CustID);
+GO
@@ -3,6 +3,7 @@ import os
 from dotenv import load_dotenv
 import pandas as pd
 import warnings
+import threading
 from sqlalchemy import create_engine, pool
 from urllib.parse import quote_plus
 
@@ -11,6 +12,31 @@ load_dotenv()
 # Suppress the pandas warning about DBAPI2 connections
 warnings.filterwarnings('ignore', message='pandas only supports SQLAlchemy connectable')
 
+# Pooled SQLAlchemy engines shared by all DatabaseConnection instances in the process,
+# keyed by (url, pool_size, max_overflow); connections return to the pool instead of
+# every instance building (and disposing) its own engine
+_shared_engines = {}
+_shared_engines_lock = threading.Lock()
+
+
+def _get_shared_engine(sqlalchemy_url, pool_size, max_overflow):
+    """Return the process-wide pooled engine for this URL and pool size, creating it once"""
+    key = (sqlalchemy_url, pool_size, max_overflow)
+    with _shared_engines_lock:
+        engine = _shared_engines.get(key)
+        if engine is None:
+            engine = create_engine(
+                sqlalchemy_url,
+                poolclass=pool.QueuePool,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_pre_ping=True,  # Verify connections before using
+                pool_recycle=3600,   # Recycle connections after 1 hour
+                echo=False
+            )
+            _shared_engines[key] = engine
+        return engine
+
 class DatabaseConnection:
     def __init__(self, pool_size=5, max_overflow=10):
         """
@@ -29,6 +55,7 @@ class DatabaseConnection:
         self.engine = None
         self.pool_size = pool_size
         self.max_overflow = max_overflow
+        self._shared_engine = False
 
     def connect(self, enable_pooling=True):
         """
@@ -66,18 +93,12 @@ class DatabaseConnection:
             )
 
             if enable_pooling:
-                # Create engine with connection pooling for better performance
-                self.engine = create_engine(
-                    sqlalchemy_url,
-                    poolclass=pool.QueuePool,
-                    pool_size=self.pool_size,
-                    max_overflow=self.max_overflow,
-                    pool_pre_ping=True,  # Verify connections before using
-                    pool_recycle=3600,   # Recycle connections after 1 hour
-                    echo=False
-                )
+                # Reuse the process-wide pooled engine for better performance
+                self.engine = _get_shared_engine(sqlalchemy_url, self.pool_size, self.max_overflow)
+                self._shared_engine = True
             else:
                 self.engine = create_engine(sqlalchemy_url)
+                self._shared_engine = False
 
             print(f"Database connection successful! (Pooling: {enable_pooling})")
             return self.connection
@@ -127,9 +148,20 @@ class DatabaseConnection:
             print(f"Error executing insert: {e}")
             return False
 
+    def bulk_cursor(self):
+        """
+        Get a cursor for executemany() batches with pyodbc fast_executemany enabled
+
+        fast_executemany sends the whole parameter array to SQL Server in one
+        round-trip instead of one round-trip per row.
+        """
+        cursor = self.connection.cursor()
+        cursor.fast_executemany = True
+        return cursor
+
     def execute_bulk_insert(self, query, data_list):
         try:
-            cursor = self.connection.cursor()
+            cursor = self.bulk_cursor()
             cursor.executemany(query, data_list)
             self.connection.commit()
             return True
@@ -140,5 +172,6 @@ class DatabaseConnection:
     def close(self):
         if self.connection:
             self.connection.close()
-        if self.engine:
+        # Shared pooled engines stay alive for other instances; only dispose our own
+        if self.engine and not self._shared_engine:
             self.engine.dispose()
\ No newline at end of file
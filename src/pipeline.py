@@ -16,8 +16,10 @@ from datetime import datetime, timedelta
 import logging
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import time
-from math import radians, cos, sin, asin, sqrt
+from math import radians, cos
 import threading
+from collections import Counter
+from itertools import repeat
 
 # Import database module from local src directory
 try:
@@ -28,7 +30,11 @@ except ImportError as e:
     sys.exit(1)
 
 class HierarchicalMonthlyRoutePipelineProcessor:
-    def __init__(self, batch_size=50, max_workers=4, start_lat=None, start_lon=None, distributor_id=None):
+    # Precomputed columns stored on the cached prospect pool (see get_unvisited_prospect_pool)
+    PROSPECT_CACHE_COLUMNS = ['custno_key', 'lat_rad', 'lon_rad', 'cos_lat']
+
+    def __init__(self, batch_size=50, max_workers=4, start_lat=None, start_lon=None, distributor_id=None,
+                 progress_interval=10, min_route_size=60, two_opt_passes=20):
         """Initialize hierarchical monthly route pipeline processor
 
         Args:
@@ -37,6 +43,9 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             start_lat: Starting latitude for TSP optimization (optional)
             start_lon: Starting longitude for TSP optimization (optional)
             distributor_id: Filter by specific distributor ID (optional)
+            progress_interval: Log progress every N combinations processed (default: 10)
+            min_route_size: Customers per route before prospects are added (default: 60)
+            two_opt_passes: Max 2-opt improvement passes after nearest neighbor, 0 disables (default: 20)
         """
         self.batch_size = batch_size
         self.max_workers = max_workers
@@ -46,12 +55,18 @@ class HierarchicalMonthlyRoutePipelineProcessor:
         self.start_lat = start_lat
         self.start_lon = start_lon
         self.distributor_id = distributor_id
+        self.progress_interval = max(1, progress_interval)
+        self._last_progress_report = 0
+        self.min_route_size = min_route_size
+        self.two_opt_passes = max(0, two_opt_passes)
 
         # Performance optimization: Add caching
         self._customer_coords_cache = {}  # Cache customer coordinates
         self._barangay_cache = {}  # Cache barangay lookups
         self._prospect_cache = {}  # Cache prospect queries
         self._distributor_location_cache = {}  # Cache distributor locations
+        self._custype_cache = {}  # Cache custype (customer/prospect) per CustNo
+        self.custno_param_batch_size = 2000  # CustNos per VALUES batch (SQL Server allows 2100 parameters)
 
         # Track if user explicitly set start coordinates via CLI
         self._user_set_coordinates = start_lat is not None and start_lon is not None
@@ -60,6 +75,10 @@ class HierarchicalMonthlyRoutePipelineProcessor:
         self._progress_lock = threading.Lock()
         self._cache_lock = threading.Lock()
 
+        # One reusable database connection per worker thread (parallel mode)
+        self._thread_local = threading.local()
+        self._thread_connections = []
+
         # Setup logging
         self.setup_logging()
 
@@ -81,6 +100,76 @@ class HierarchicalMonthlyRoutePipelineProcessor:
         )
         self.logger = logging.getLogger(__name__)
 
+    def query_by_custnos(self, db, query_template, custnos):
+        """
+        Run a query joined against a parameterized VALUES list of CustNos
+
+        Replaces string-built `CustNo IN ('...')` lists: the values are sent as
+        parameters (no quoting/injection issues) and joined as a derived table
+        `ids(CustNo)`. Large lists are split into batches that stay under SQL
+        Server's parameter limit.
+
+        Args:
+            db: Database connection
+            query_template: SQL containing a `{custno_values}` placeholder for the
+                VALUES row constructors, e.g.
+                `... INNER JOIN (VALUES {custno_values}) ids(CustNo) ON ...`
+            custnos: Iterable of customer numbers (duplicates are ignored)
+
+        Returns:
+            Combined DataFrame of all batches, or None if every batch failed
+        """
+        unique_custnos = list(dict.fromkeys(str(c) for c in custnos))
+        frames = []
+        for start in range(0, len(unique_custnos), self.custno_param_batch_size):
+            batch = unique_custnos[start:start + self.custno_param_batch_size]
+            query = query_template.format(custno_values=", ".join(["(?)"] * len(batch)))
+            batch_df = db.execute_query_df(query, params=tuple(batch))
+            if batch_df is not None:
+                frames.append(batch_df)
+
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def load_custypes(self, db, custnos):
+        """
+        Look up custype ('customer' or 'prospect') for CustNos not yet in the cache
+
+        Callers can pass every CustNo an agent will need up front, so the per-date
+        enrichment steps are served from the cache.
+
+        Args:
+            db: Database connection
+            custnos: Iterable of customer numbers
+        """
+        # Use cached custype lookups to avoid repeated queries
+        with self._cache_lock:
+            uncached_custnos = [cno for cno in dict.fromkeys(custnos) if cno not in self._custype_cache]
+
+        if not uncached_custnos:
+            return
+
+        # OPTIMIZED: Single query with UNION ALL instead of 2 separate queries;
+        # the CustNo list is bound once as a parameterized VALUES table
+        combined_query = """
+        WITH ids AS (
+            SELECT CONVERT(VARCHAR(50), CustNo) as CustNo
+            FROM (VALUES {custno_values}) v(CustNo)
+        )
+        SELECT c.CustNo, 'customer' as custype FROM customer c INNER JOIN ids ON c.CustNo = ids.CustNo
+        UNION ALL
+        SELECT p.tdlinx as CustNo, 'prospect' as custype FROM prospective p INNER JOIN ids ON p.tdlinx = ids.CustNo
+        """
+        custype_results = self.query_by_custnos(db, combined_query, uncached_custnos)
+
+        # Cache results; CustNos in neither table are cached as 'unknown' so they are
+        # not queried again for every route date (a failed query caches nothing)
+        if custype_results is not None:
+            with self._cache_lock:
+                self._custype_cache.update(dict.fromkeys(uncached_custnos, 'unknown'))
+                self._custype_cache.update(zip(custype_results['CustNo'], custype_results['custype']))
+
     def get_customer_coordinates_batch(self, db, customer_nos_list):
         """
         Performance optimization: Batch fetch customer coordinates with caching
@@ -98,7 +187,7 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             cached_data = []
 
             with self._cache_lock:
-                for custno in customer_nos_list:
+                for custno in dict.fromkeys(customer_nos_list):
                     if custno in self._customer_coords_cache:
                         cached_data.append(self._customer_coords_cache[custno])
                     else:
@@ -106,27 +195,29 @@ class HierarchicalMonthlyRoutePipelineProcessor:
 
             # Fetch uncached data from database
             if uncached_custnos:
-                customer_nos = "', '".join([str(c) for c in uncached_custnos])
-                customer_query = f"""
+                customer_query = """
                 SELECT
-                    CustNo, latitude, longitude, address3 as barangay_code
-                FROM customer
-                WHERE CustNo IN ('{customer_nos}')
-                AND latitude IS NOT NULL
-                AND longitude IS NOT NULL
-                AND latitude != 0.0
-                AND longitude != 0.0
-                AND ABS(latitude) > 0.000001
-                AND ABS(longitude) > 0.000001
+                    c.CustNo, c.latitude, c.longitude, c.address3 as barangay_code
+                FROM customer c
+                INNER JOIN (VALUES {custno_values}) ids(CustNo)
+                    ON c.CustNo = CONVERT(VARCHAR(50), ids.CustNo)
+                WHERE c.latitude IS NOT NULL
+                AND c.longitude IS NOT NULL
+                AND c.latitude != 0.0
+                AND c.longitude != 0.0
+                AND ABS(c.latitude) > 0.000001
+                AND ABS(c.longitude) > 0.000001
                 """
-                customer_coords_df = db.execute_query_df(customer_query)
+                customer_coords_df = self.query_by_custnos(db, customer_query, uncached_custnos)
 
                 if customer_coords_df is not None and not customer_coords_df.empty:
                     # Cache the results (thread-safe)
+                    # OPTIMIZED: Convert rows to dicts in one pass instead of iterrows() + to_dict() per row
+                    fetched_records = customer_coords_df.to_dict('records')
                     with self._cache_lock:
-                        for _, row in customer_coords_df.iterrows():
-                            self._customer_coords_cache[row['CustNo']] = row.to_dict()
-                            cached_data.append(row.to_dict())
+                        for record in fetched_records:
+                            self._customer_coords_cache[record['CustNo']] = record
+                    cached_data.extend(fetched_records)
 
             # Convert cached data to DataFrame
             if cached_data:
@@ -168,14 +259,14 @@ class HierarchicalMonthlyRoutePipelineProcessor:
                     return cached_location['Latitude'], cached_location['Longitude']
 
             # Priority 2: Fetch from distributors table
-            distributor_query = f"""
+            distributor_query = """
             SELECT TOP 1
                 Latitude,
                 Longitude,
                 Name,
                 Address
             FROM distributors
-            WHERE DistributorID = '{distributor_id}'
+            WHERE DistributorID = ?
             AND Latitude IS NOT NULL
             AND Longitude IS NOT NULL
             AND Latitude != 0
@@ -184,7 +275,7 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             AND ABS(Longitude) > 0.000001
             """
 
-            distributor_df = db.execute_query_df(distributor_query)
+            distributor_df = db.execute_query_df(distributor_query, params=(distributor_id,))
 
             if distributor_df is not None and not distributor_df.empty:
                 distributor = distributor_df.iloc[0]
@@ -203,15 +294,33 @@ class HierarchicalMonthlyRoutePipelineProcessor:
                                f"({location_data['Latitude']:.6f}, {location_data['Longitude']:.6f})")
 
                 return location_data['Latitude'], location_data['Longitude']
-            else:
+            elif distributor_df is not None:
                 # Priority 3: Fallback to config defaults
                 self.logger.warning(f"No location found for distributor {distributor_id}, using config defaults")
                 if self.start_lat and self.start_lon:
-                    return self.start_lat, self.start_lon
+                    fallback_lat, fallback_lon = self.start_lat, self.start_lon
                 else:
                     # Ultimate fallback - Manila coordinates
                     self.logger.warning("No start coordinates configured, using Manila default")
-                    return 14.5995, 120.9842
+                    fallback_lat, fallback_lon = 14.5995, 120.9842
+
+                # Cache the fallback too, so other agents of this distributor skip the lookup
+                # (a failed query returns None above and is not cached, so it is retried)
+                with self._cache_lock:
+                    self._distributor_location_cache[distributor_id] = {
+                        'Latitude': fallback_lat,
+                        'Longitude': fallback_lon,
+                        'Name': 'Unknown',
+                        'Address': 'Unknown'
+                    }
+                return fallback_lat, fallback_lon
+            else:
+                # Query failed: fall back without caching so the next agent retries
+                self.logger.error(f"Distributor location query failed for {distributor_id}")
+                if self.start_lat and self.start_lon:
+                    return self.start_lat, self.start_lon
+                self.logger.warning("Using Manila default coordinates due to error")
+                return 14.5995, 120.9842
 
         except Exception as e:
             self.logger.error(f"Error fetching distributor location: {e}")
@@ -232,51 +341,55 @@ class HierarchicalMonthlyRoutePipelineProcessor:
 
             # OPTIMIZED: Single query to get entire hierarchy
             distributor_filter = ""
+            hierarchy_params = None
             if self.distributor_id:
-                distributor_filter = f"AND DistributorID = '{self.distributor_id}'"
+                distributor_filter = "AND DistributorID = ?"
+                hierarchy_params = (self.distributor_id,)
                 self.logger.info(f"Filtering for DistributorID: {self.distributor_id}")
 
             # Single query gets all distributors, agents, dates, and stats
+            # OPTIMIZED: Two-stage aggregation (distinct customers per route, then count)
+            # instead of COUNT(DISTINCT) with a per-group hash-distinct; the inner stage streams
+            # in ix_mrp_temp_dist_agent_date key order
             hierarchy_query = f"""
             SELECT
                 DistributorID,
                 AgentID,
                 RouteDate,
-                COUNT(DISTINCT CustNo) as customer_count,
-                COUNT(*) as total_records
-            FROM MonthlyRoutePlan_temp
-            WHERE DistributorID IS NOT NULL
-                AND AgentID IS NOT NULL
-                AND RouteDate IS NOT NULL
-                AND CustNo IS NOT NULL
-                {distributor_filter}
+                COUNT(*) as customer_count,
+                SUM(record_count) as total_records
+            FROM (
+                SELECT
+                    DistributorID,
+                    AgentID,
+                    RouteDate,
+                    CustNo,
+                    COUNT(*) as record_count
+                FROM MonthlyRoutePlan_temp
+                WHERE DistributorID IS NOT NULL
+                    AND AgentID IS NOT NULL
+                    AND RouteDate IS NOT NULL
+                    AND CustNo IS NOT NULL
+                    {distributor_filter}
+                GROUP BY DistributorID, AgentID, RouteDate, CustNo
+            ) route_customers
             GROUP BY DistributorID, AgentID, RouteDate
             ORDER BY DistributorID, AgentID, RouteDate ASC
             """
 
-            hierarchy_df = db.execute_query_df(hierarchy_query)
+            hierarchy_df = db.execute_query_df(hierarchy_query, params=hierarchy_params)
 
             if hierarchy_df is None or hierarchy_df.empty:
                 self.logger.error("No data found in MonthlyRoutePlan_temp")
                 return {}
 
             # Build hierarchy dictionary from query results
+            # OPTIMIZED: One groupby over the result set instead of a per-row iterrows() loop
             hierarchy = {}
-            for _, row in hierarchy_df.iterrows():
-                distributor_id = row['DistributorID']
-                agent_id = row['AgentID']
-
-                if distributor_id not in hierarchy:
-                    hierarchy[distributor_id] = {}
-
-                if agent_id not in hierarchy[distributor_id]:
-                    hierarchy[distributor_id][agent_id] = []
-
-                hierarchy[distributor_id][agent_id].append({
-                    'RouteDate': row['RouteDate'],
-                    'customer_count': row['customer_count'],
-                    'total_records': row['total_records']
-                })
+            date_columns = ['RouteDate', 'customer_count', 'total_records']
+            for (distributor_id, agent_id), agent_dates in hierarchy_df.groupby(
+                    ['DistributorID', 'AgentID'], sort=False):
+                hierarchy.setdefault(distributor_id, {})[agent_id] = agent_dates[date_columns].to_dict('records')
 
             # Log summary
             for distributor_id, agents in hierarchy.items():
@@ -295,9 +408,60 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             self.logger.error(f"Error building hierarchy: {e}")
             return {}
 
+    def get_thread_connection(self):
+        """
+        Get the calling worker thread's database connection, connecting on first use
+
+        Each thread needs its own connection to avoid conflicts, but a thread can
+        reuse it for every agent it processes instead of paying connect/login and
+        engine setup per agent. Connections are closed by close_thread_connections().
+
+        Returns:
+            DatabaseConnection owned by the current thread
+        """
+        db = getattr(self._thread_local, 'db', None)
+        if db is None:
+            # All worker connections share one engine, so its pool holds one
+            # connection per worker; a fixed cap would make read_sql wait for a
+            # free connection (and time out) once max_workers exceeds it
+            db = DatabaseConnection(pool_size=self.max_workers, max_overflow=2)
+            if db.connect() is None:
+                raise RuntimeError("Could not open database connection for worker thread")
+            self._thread_local.db = db
+            with self._cache_lock:
+                self._thread_connections.append(db)
+        return db
+
+    def reset_thread_connection(self):
+        """
+        Close and forget the calling thread's database connection
+
+        Called after a failed task so a dropped or broken connection is not reused
+        for the rest of the run; the next get_thread_connection() reconnects.
+        """
+        db = getattr(self._thread_local, 'db', None)
+        if db is None:
+            return
+        self._thread_local.db = None
+        with self._cache_lock:
+            if db in self._thread_connections:
+                self._thread_connections.remove(db)
+        try:
+            db.close()
+        except Exception as e:
+            self.logger.debug(f"Error closing failed worker connection: {e}")
+
+    def close_thread_connections(self):
+        """Close all per-thread database connections opened by get_thread_connection()"""
+        with self._cache_lock:
+            connections = self._thread_connections
+            self._thread_connections = []
+        for db in connections:
+            db.close()
+
     def process_agent_parallel_wrapper(self, distributor_id, agent_id, dates_list):
         """
-        Wrapper for parallel agent processing - creates its own DB connection
+        Wrapper for parallel agent processing - runs on the worker thread's own DB connection
         Each thread needs its own database connection to avoid conflicts
 
         Args:
@@ -308,30 +472,28 @@ class HierarchicalMonthlyRoutePipelineProcessor:
         Returns:
             List of result dictionaries
         """
-        db = None
         try:
-            # Create dedicated database connection for this thread
-            db = DatabaseConnection(pool_size=2, max_overflow=5)
-            db.connect(enable_pooling=True)
-
-            # Process the agent using the dedicated connection
+            # OPTIMIZED: Reuse this thread's dedicated connection across agents
+            db = self.get_thread_connection()
             results = self.process_agent_with_sequential_stopno(
                 db, distributor_id, agent_id, dates_list
             )
 
+            # Don't reuse a connection that may have failed for this thread's next agent
+            if any(result.get("status") == "error" for result in results):
+                self.reset_thread_connection()
+
             return results
 
         except Exception as e:
             self.logger.error(f"Error in parallel agent processing {agent_id}: {e}")
+            self.reset_thread_connection()
             return [{
                 "status": "error",
                 "distributor": distributor_id,
                 "agent": agent_id,
                 "error": str(e)
             }]
-        finally:
-            if db:
-                db.close()
 
     def process_agent_with_sequential_stopno(self, db, distributor_id, agent_id, dates_list):
         """Process all dates for a single agent with sequential StopNo across all dates"""
@@ -345,12 +507,21 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             # Sort dates chronologically
             sorted_dates = sorted(dates_list, key=lambda x: x['RouteDate'])
 
-            # Collect all data across all dates for sequential numbering
-            all_optimized_data = []
-            all_no_coord_data = []
+            # Collect all data across all dates for sequential numbering, keyed by route date
+            optimized_by_date = {}
+            no_coord_by_date = {}
             results = []
             current_stopno = 1
 
+            # OPTIMIZED: Fetch the agent's monthly plan for all dates in one query
+            # instead of one MonthlyRoutePlan_temp scan per date
+            monthly_plan_by_date = self.get_agent_monthly_plan(db, distributor_id, agent_id)
+
+            # OPTIMIZED: Classify every CustNo of the agent in one custype lookup up front;
+            # the per-date enrichment then reads custype from the cache
+            if monthly_plan_by_date:
+                self.load_custypes(db, pd.concat(monthly_plan_by_date.values())['CustNo'])
+
             # Process each date and collect optimized data
             for date_info in sorted_dates:
                 route_date = date_info['RouteDate']
@@ -374,7 +545,12 @@ class HierarchicalMonthlyRoutePipelineProcessor:
                     continue
 
                 # Get and enrich data for this date
-                all_data_for_tsp, customers_without_coords = self.enrich_monthly_plan_data(db, distributor_id, agent_id, route_date)
+                monthly_plan_df = None
+                if monthly_plan_by_date is not None:
+                    monthly_plan_df = monthly_plan_by_date.get(route_date, pd.DataFrame())
+                all_data_for_tsp, customers_without_coords = self.enrich_monthly_plan_data(
+                    db, distributor_id, agent_id, route_date, monthly_plan_df=monthly_plan_df
+                )
 
                 if not all_data_for_tsp.empty:
                     # Apply TSP optimization using distributor-specific starting location
@@ -383,162 +559,102 @@ class HierarchicalMonthlyRoutePipelineProcessor:
 
                     # Keep track of the original route date
                     optimized_data['RouteDate'] = route_date
-                    all_optimized_data.append(optimized_data)
+                    optimized_by_date.setdefault(route_date, optimized_data)
 
                 if not customers_without_coords.empty:
                     # Keep customers without coordinates separate
                     customers_without_coords['RouteDate'] = route_date
-                    all_no_coord_data.append(customers_without_coords)
+                    no_coord_by_date.setdefault(route_date, customers_without_coords)
 
             # Now assign FRESH sequential StopNo across all dates (ignoring any existing StopNo)
             total_updates = 0
 
-            # Combine all data from all dates into one big list for sequential numbering
-            all_customers_for_sequential_assignment = []
+            # Build one assignment frame per date instead of a list of per-row dicts.
+            # OPTIMIZED: new_stopno is assigned as a column, and the prospect flag comes
+            # from each row's own custype, so no rescans of the optimized frames are needed
+            assignment_frames = []
 
             # Process each date separately with per-date StopNo assignment (1-N per date)
             for date_info in sorted_dates:
                 route_date = date_info['RouteDate']
 
-                # Find optimized data for this date
-                optimized_for_this_date = None
-                for optimized_data in all_optimized_data:
-                    if optimized_data['RouteDate'].iloc[0] == route_date:
-                        optimized_for_this_date = optimized_data
-                        break
-
-                # Find no-coordinate data for this date
-                no_coord_for_this_date = None
-                for no_coord_data in all_no_coord_data:
-                    if no_coord_data['RouteDate'].iloc[0] == route_date:
-                        no_coord_for_this_date = no_coord_data
-                        break
-
-                # For each date, start StopNo from 1 for customers with coordinates
-                date_stopno = 1
+                # Find optimized and no-coordinate data for this date (dict lookups)
+                optimized_for_this_date = optimized_by_date.get(route_date)
+                no_coord_for_this_date = no_coord_by_date.get(route_date)
 
                 # Add optimized customers first (StopNo 1, 2, 3, ... N)
                 if optimized_for_this_date is not None:
-                    for _, row in optimized_for_this_date.iterrows():
-                        all_customers_for_sequential_assignment.append({
-                            'CustNo': row['CustNo'],
-                            'RouteDate': row['RouteDate'],
-                            'new_stopno': date_stopno,
-                            'type': 'optimized'
-                        })
-                        date_stopno += 1
+                    assignment_frames.append(optimized_for_this_date.assign(
+                        new_stopno=np.arange(1, len(optimized_for_this_date) + 1),
+                        type='optimized'
+                    ))
 
                 # Add customers without coordinates (StopNo = 100)
                 if no_coord_for_this_date is not None:
-                    for _, row in no_coord_for_this_date.iterrows():
-                        all_customers_for_sequential_assignment.append({
-                            'CustNo': row['CustNo'],
-                            'RouteDate': row['RouteDate'],
-                            'new_stopno': 100,
-                            'type': 'no_coordinates'
-                        })
+                    assignment_frames.append(no_coord_for_this_date.assign(
+                        new_stopno=100,
+                        type='no_coordinates'
+                    ))
+
+            if assignment_frames:
+                assignments = pd.concat(assignment_frames, ignore_index=True)
+            else:
+                assignments = pd.DataFrame(columns=['CustNo', 'RouteDate', 'new_stopno', 'type'])
 
             # Now update existing customers and insert prospects with their new StopNo assignments
-            updates_by_date = {}
-            inserts_by_date = {}
+            self.logger.info(f"Processing {len(assignments)} records (updates + inserts)")
+
+            # Optimized prospects are INSERTed; everything else is an UPDATE
+            if 'custype' in assignments.columns:
+                is_prospect = (assignments['type'] == 'optimized') & (assignments['custype'] == 'prospect')
+            else:
+                is_prospect = pd.Series(False, index=assignments.index)
+            prospect_assignments = assignments[is_prospect]
+            existing_assignments = assignments[~is_prospect]
 
-            self.logger.info(f"Processing {len(all_customers_for_sequential_assignment)} records (updates + inserts)")
+            updates_by_date = existing_assignments['RouteDate'].value_counts().to_dict()
+            inserts_by_date = prospect_assignments['RouteDate'].value_counts().to_dict()
 
             # Use direct database connection for more reliable operations
             connection = db.connection
-            cursor = connection.cursor()
+            cursor = db.bulk_cursor()  # fast_executemany for the batch UPDATE/INSERT
 
             try:
                 # Separate existing customers (for UPDATE) from prospects (for INSERT)
-                update_params = []
-                insert_params = []
-
-                for customer in all_customers_for_sequential_assignment:
-                    if customer['type'] == 'optimized':
-                        # Check if this is an existing customer or a prospect
-                        # Find the original record in optimized data
-                        is_prospect = False
-                        for optimized_data in all_optimized_data:
-                            matching_rows = optimized_data[
-                                (optimized_data['CustNo'] == customer['CustNo']) &
-                                (optimized_data['RouteDate'] == customer['RouteDate'])
-                            ]
-                            if not matching_rows.empty and 'custype' in matching_rows.columns:
-                                is_prospect = (matching_rows.iloc[0]['custype'] == 'prospect')
-                                break
-
-                        if is_prospect:
-                            # INSERT prospect into monthlyrouteplan_temp
-                            # Get prospect details from optimized_data
-                            for optimized_data in all_optimized_data:
-                                matching_rows = optimized_data[
-                                    (optimized_data['CustNo'] == customer['CustNo']) &
-                                    (optimized_data['RouteDate'] == customer['RouteDate'])
-                                ]
-                                if not matching_rows.empty:
-                                    prospect_row = matching_rows.iloc[0]
-
-                                    # Convert numpy types to native Python types
-                                    wd_value = prospect_row.get('WD', 1)
-                                    if pd.notna(wd_value):
-                                        wd_value = int(wd_value)
-                                    else:
-                                        wd_value = 1
-
-                                    # Truncate Name to avoid SQL truncation error
-                                    # Name column appears to be VARCHAR(15) based on SQL errors
-                                    name_value = str(prospect_row.get('Name', ''))[:15]  # Truncate to 15 chars
-
-                                    insert_params.append((
-                                        str(distributor_id)[:30],  # Truncate all fields for safety
-                                        str(agent_id)[:30],
-                                        str(customer['RouteDate']),
-                                        str(customer['CustNo'])[:30],
-                                        int(customer['new_stopno']),
-                                        name_value,
-                                        wd_value,
-                                        str(prospect_row.get('SalesManTerritory', ''))[:30],
-                                        str(prospect_row.get('RouteName', ''))[:30],
-                                        str(prospect_row.get('RouteCode', ''))[:30],
-                                        str(prospect_row.get('SalesOfficeID', ''))[:30]
-                                    ))
-
-                                    # Track inserts by date
-                                    date_key = customer['RouteDate']
-                                    if date_key not in inserts_by_date:
-                                        inserts_by_date[date_key] = 0
-                                    inserts_by_date[date_key] += 1
-                                    break
-                        else:
-                            # UPDATE existing customer
-                            update_params.append((
-                                customer['new_stopno'],
-                                distributor_id,
-                                agent_id,
-                                customer['RouteDate'],
-                                customer['CustNo']
-                            ))
-
-                            # Track updates by date
-                            date_key = customer['RouteDate']
-                            if date_key not in updates_by_date:
-                                updates_by_date[date_key] = 0
-                            updates_by_date[date_key] += 1
-                    else:
-                        # No coordinates - UPDATE existing customer
-                        update_params.append((
-                            customer['new_stopno'],
-                            distributor_id,
-                            agent_id,
-                            customer['RouteDate'],
-                            customer['CustNo']
-                        ))
-
-                        # Track updates by date
-                        date_key = customer['RouteDate']
-                        if date_key not in updates_by_date:
-                            updates_by_date[date_key] = 0
-                        updates_by_date[date_key] += 1
+                # tolist() yields native Python values, which pyodbc requires;
+                # route-level constants are converted once and repeated
+                update_params = list(zip(
+                    existing_assignments['new_stopno'].tolist(),
+                    repeat(distributor_id),
+                    repeat(agent_id),
+                    existing_assignments['RouteDate'].tolist(),
+                    existing_assignments['CustNo'].tolist()
+                ))
+
+                # OPTIMIZED: Insert payload assembled column-wise instead of a per-row dict loop;
+                # missing optional columns fall back to the same defaults as before
+                prospect_details = prospect_assignments.reindex(
+                    columns=['Name', 'SalesManTerritory', 'RouteName', 'RouteCode', 'SalesOfficeID'], fill_value=''
+                )
+                wd_values = prospect_assignments.reindex(columns=['WD'], fill_value=1)['WD'].fillna(1).astype(int)
+
+                def truncated(values, max_len):
+                    return [str(value)[:max_len] for value in values.tolist()]
+
+                # Truncate all fields for safety; Name column appears to be VARCHAR(15) based on SQL errors
+                insert_params = list(zip(
+                    repeat(str(distributor_id)[:30]),
+                    repeat(str(agent_id)[:30]),
+                    map(str, prospect_assignments['RouteDate'].tolist()),
+                    truncated(prospect_assignments['CustNo'], 30),
+                    prospect_assignments['new_stopno'].astype(int).tolist(),
+                    truncated(prospect_details['Name'], 15),
+                    wd_values.tolist(),
+                    truncated(prospect_details['SalesManTerritory'], 30),
+                    truncated(prospect_details['RouteName'], 30),
+                    truncated(prospect_details['RouteCode'], 30),
+                    truncated(prospect_details['SalesOfficeID'], 30)
+                ))
 
                 # Execute batch update for existing customers
                 if update_params:
@@ -624,43 +740,120 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             if customer_count >= 25:
                 scenario_info['scenario'] = 'high_volume'
                 scenario_info['should_process'] = True
-                self.logger.info(f"  Scenario: High Volume (25+ customers)")
+                self.logger.debug(f"  Scenario: High Volume (25+ customers)")
                 return True, scenario_info
 
             # Scenario 2: Medium volume routes (10-24 customers)
             elif customer_count >= 10:
                 scenario_info['scenario'] = 'medium_volume'
                 scenario_info['should_process'] = True
-                self.logger.info(f"  Scenario: Medium Volume (10-24 customers)")
+                self.logger.debug(f"  Scenario: Medium Volume (10-24 customers)")
                 return True, scenario_info
 
             # Scenario 3: Low volume routes (5-9 customers)
             elif customer_count >= 5:
                 scenario_info['scenario'] = 'low_volume'
                 scenario_info['should_process'] = True
-                self.logger.info(f"  Scenario: Low Volume (5-9 customers)")
+                self.logger.debug(f"  Scenario: Low Volume (5-9 customers)")
                 return True, scenario_info
 
             # Scenario 4: Very small routes (1-4 customers)
             else:
                 scenario_info['scenario'] = 'very_small'
                 scenario_info['should_process'] = True
-                self.logger.info(f"  Scenario: Very Small (< 5 customers)")
+                self.logger.debug(f"  Scenario: Very Small (< 5 customers)")
                 return True, scenario_info
 
         except Exception as e:
             self.logger.error(f"Error checking scenario conditions: {e}")
             return False, {'error': str(e)}
 
-    def haversine_distance(self, lat1, lon1, lat2, lon2):
-        """Calculate the great circle distance between two points on Earth (in km)"""
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    def haversine_distance_vec(self, lat1, lon1, lat2, lon2):
+        """
+        Vectorized haversine distance (in km) using NumPy broadcasting
+
+        Args:
+            lat1, lon1: Origin point(s) in degrees (scalar or array)
+            lat2, lon2: Destination point(s) in degrees (scalar or array)
+
+        Returns:
+            NumPy array of distances, broadcast over the inputs
+        """
+        lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
         dlat = lat2 - lat1
         dlon = lon2 - lon1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * asin(sqrt(a))
-        r = 6371  # Radius of earth in kilometers
-        return c * r
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        return 2 * 6371 * np.arcsin(np.sqrt(a))
+
+    def haversine_distance_from_point(self, lat, lon, lat_rad, lon_rad, cos_lat):
+        """
+        Haversine distance (in km) from one point to many, using precomputed trig
+
+        For static point sets (the cached prospect pool) the radians and cos(lat)
+        are computed once, so each query only evaluates the per-pair terms.
+
+        Args:
+            lat, lon: Origin point in degrees
+            lat_rad, lon_rad: Destination coordinates in radians (arrays)
+            cos_lat: cos(lat_rad) for the destinations (array)
+
+        Returns:
+            NumPy array of distances
+        """
+        lat1, lon1 = radians(lat), radians(lon)
+        a = np.sin((lat_rad - lat1) / 2) ** 2 + cos(lat1) * cos_lat * np.sin((lon_rad - lon1) / 2) ** 2
+        return 2 * 6371 * np.arcsin(np.sqrt(a))
+
+    def get_unvisited_prospect_pool(self, db):
+        """
+        Get all prospects with valid coordinates that have never been visited
+
+        The pool is the same for every route (custvisit and prospective are not
+        modified by the pipeline), so it is read from the database once and
+        cached for the rest of the run. A failed read is not cached, so the next
+        route retries the load.
+
+        Returns:
+            DataFrame (CustNo, latitude, longitude, barangay_code, Name, plus the
+            precomputed custno_key (CustNo as str) for exclusion checks and lat_rad,
+            lon_rad, cos_lat for distance queries), or None if the query failed
+        """
+        with self._cache_lock:
+            if 'unvisited_pool' in self._prospect_cache:
+                return self._prospect_cache['unvisited_pool']
+
+        # We'll filter by distance in Python since SQL Server spatial queries can be complex
+        prospect_query = """
+        SELECT
+            tdlinx as CustNo, latitude, longitude,
+            barangay_code, store_name_nielsen as Name
+        FROM prospective
+        WHERE latitude IS NOT NULL
+        AND longitude IS NOT NULL
+        AND latitude != 0
+        AND longitude != 0
+        AND NOT EXISTS (
+            SELECT 1 FROM custvisit
+            WHERE custvisit.CustID = prospective.tdlinx
+        )
+        """
+        prospect_pool = db.execute_query_df(prospect_query)
+        if prospect_pool is None:
+            self.logger.error("Failed to load unvisited prospect pool")
+            return None
+
+        # OPTIMIZED: The str CustNo key and the trig of the static pool coordinates are
+        # computed once here rather than on every route's search
+        prospect_pool['custno_key'] = prospect_pool['CustNo'].astype(str)
+        lat_rad = np.radians(prospect_pool['latitude'].to_numpy(dtype=float))
+        prospect_pool['lat_rad'] = lat_rad
+        prospect_pool['lon_rad'] = np.radians(prospect_pool['longitude'].to_numpy(dtype=float))
+        prospect_pool['cos_lat'] = np.cos(lat_rad)
+        self.logger.info(f"Loaded {len(prospect_pool)} unvisited prospects into cache")
+
+        with self._cache_lock:
+            self._prospect_cache['unvisited_pool'] = prospect_pool
+        return prospect_pool
 
     def find_nearby_prospects_by_location(self, db, distributor_id, agent_id, route_date, customers_with_coords, needed_prospects, max_distance_km=5.0, exclude_custnos=None):
         """
@@ -688,71 +881,65 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             center_lat = customers_with_coords['latitude'].mean()
             center_lon = customers_with_coords['longitude'].mean()
 
-            self.logger.info(f"Searching for prospects near center point: ({center_lat:.6f}, {center_lon:.6f})")
-            self.logger.info(f"Search radius: {max_distance_km} km")
+            self.logger.debug(f"Searching for prospects near center point: ({center_lat:.6f}, {center_lon:.6f})")
+            self.logger.debug(f"Search radius: {max_distance_km} km")
 
-            # Build exclusion clause if needed
-            exclusion_clause = ""
+            # Prospects already on this route (and any explicitly excluded ones) are skipped
+            route_custnos_query = """
+            SELECT CustNo
+            FROM MonthlyRoutePlan_temp
+            WHERE DistributorID = ?
+                AND AgentID = ?
+                AND RouteDate = CONVERT(DATE, ?)
+            """
+            route_custnos_df = db.execute_query_df(
+                route_custnos_query, params=(distributor_id, agent_id, str(route_date))
+            )
+            excluded_custnos = set()
+            if route_custnos_df is not None and not route_custnos_df.empty:
+                excluded_custnos.update(route_custnos_df['CustNo'].astype(str))
             if exclude_custnos is not None and len(exclude_custnos) > 0:
-                exclude_list = "', '".join([str(cust) for cust in exclude_custnos])
-                exclusion_clause = f"AND tdlinx NOT IN ('{exclude_list}')"
-                self.logger.info(f"Excluding {len(exclude_custnos)} already-found prospects from search")
+                excluded_custnos.update(str(cust) for cust in exclude_custnos)
+                self.logger.debug(f"Excluding {len(exclude_custnos)} already-found prospects from search")
 
-            # Get all prospects from prospective table with coordinates
-            # We'll filter by distance in Python since SQL Server spatial queries can be complex
-            prospect_query = f"""
-            SELECT
-                tdlinx as CustNo, latitude, longitude,
-                barangay_code, store_name_nielsen as Name
-            FROM prospective
-            WHERE latitude IS NOT NULL
-            AND longitude IS NOT NULL
-            AND latitude != 0
-            AND longitude != 0
-            {exclusion_clause}
-            AND NOT EXISTS (
-                SELECT 1 FROM MonthlyRoutePlan_temp
-                WHERE MonthlyRoutePlan_temp.CustNo = prospective.tdlinx
-                AND MonthlyRoutePlan_temp.DistributorID = '{distributor_id}'
-                AND MonthlyRoutePlan_temp.AgentID = '{agent_id}'
-                AND MonthlyRoutePlan_temp.RouteDate = CONVERT(DATE, '{route_date}')
-            )
-            AND NOT EXISTS (
-                SELECT 1 FROM custvisit
-                WHERE custvisit.CustID = prospective.tdlinx
-            )
-            """
+            # OPTIMIZED: The unvisited prospect pool is loaded once per run and reused for
+            # every route; only the small per-route exclusion set is queried each time
+            prospect_pool = self.get_unvisited_prospect_pool(db)
+            if prospect_pool is None:
+                return pd.DataFrame()
 
-            all_prospects_df = db.execute_query_df(prospect_query)
+            available = ~prospect_pool['custno_key'].isin(excluded_custnos).to_numpy()
+            total_prospects = int(available.sum())
 
-            if all_prospects_df is None or all_prospects_df.empty:
+            if total_prospects == 0:
                 self.logger.warning("No unvisited prospects found in prospective table")
                 return pd.DataFrame()
 
-            self.logger.info(f"Found {len(all_prospects_df)} total unvisited prospects, filtering by distance...")
-
-            # Calculate distance from center point to each prospect
-            distances = []
-            for _, prospect in all_prospects_df.iterrows():
-                dist = self.haversine_distance(
-                    center_lat, center_lon,
-                    prospect['latitude'], prospect['longitude']
-                )
-                distances.append(dist)
-
-            all_prospects_df['distance_km'] = distances
+            self.logger.debug(f"Scanned {total_prospects} total unvisited prospects, filtering by distance...")
 
-            # Filter prospects within max_distance_km
-            nearby_prospects = all_prospects_df[all_prospects_df['distance_km'] <= max_distance_km].copy()
+            # OPTIMIZED: Distance from center point to every prospect in one vectorized pass
+            # over the pool's precomputed trig arrays; only rows that pass both filters are
+            # copied out of the cached pool
+            distances = self.haversine_distance_from_point(
+                center_lat, center_lon,
+                prospect_pool['lat_rad'].to_numpy(),
+                prospect_pool['lon_rad'].to_numpy(),
+                prospect_pool['cos_lat'].to_numpy()
+            )
+            within_radius_mask = available & (distances <= max_distance_km)
+            total_nearby = int(within_radius_mask.sum())
 
-            if nearby_prospects.empty:
+            if total_nearby == 0:
                 self.logger.warning(f"No prospects found within {max_distance_km} km of customer locations")
                 return pd.DataFrame()
 
-            self.logger.info(f"Found {len(nearby_prospects)} prospects within {max_distance_km} km")
+            self.logger.debug(f"Found {total_nearby} prospects within {max_distance_km} km")
+
+            within_radius = prospect_pool.loc[within_radius_mask].drop(columns=self.PROSPECT_CACHE_COLUMNS)
+            within_radius['distance_km'] = distances[within_radius_mask]
 
-            # Sort by distance (closest first) and take only what we need
-            nearby_prospects = nearby_prospects.sort_values('distance_km').head(needed_prospects)
+            # OPTIMIZED: Partial top-N selection (closest first) instead of a full sort + head
+            nearby_prospects = within_radius.nsmallest(needed_prospects, 'distance_km').reset_index(drop=True)
 
             # Remove the distance column before returning
             nearby_prospects = nearby_prospects.drop('distance_km', axis=1)
@@ -779,48 +966,49 @@ class HierarchicalMonthlyRoutePipelineProcessor:
                 locations_df['stopno'] = 1
                 return locations_df
 
-            # Start from specified location or first customer
-            unvisited = locations_df.copy().reset_index(drop=True)
-            route = []
+            locations_df = locations_df.reset_index(drop=True)
+            lats = locations_df['latitude'].to_numpy(dtype=float)
+            lons = locations_df['longitude'].to_numpy(dtype=float)
+            n = len(locations_df)
+
+            # OPTIMIZED: Full N x N distance matrix computed once by broadcasting;
+            # each nearest-neighbor step is then an argmin over a masked row.
+            # Stored as float32 (sub-metre precision at route scale) to halve its footprint
+            dist_matrix = self.haversine_distance_vec(
+                lats[:, None], lons[:, None], lats[None, :], lons[None, :]
+            ).astype(np.float32)
+            visited = np.zeros(n, dtype=bool)
 
             # If starting location provided, find nearest customer to start
             if start_lat is not None and start_lon is not None:
-                self.logger.info(f"Using starting location: ({start_lat}, {start_lon})")
+                self.logger.debug(f"Using starting location: ({start_lat}, {start_lon})")
 
                 # Find nearest customer to starting location
-                distances = []
-                for _, row in unvisited.iterrows():
-                    dist = self.haversine_distance(start_lat, start_lon, row['latitude'], row['longitude'])
-                    distances.append(dist)
-
-                current_idx = np.argmin(distances)
-                self.logger.info(f"First customer is {distances[current_idx]:.2f} km from starting location")
+                distances = self.haversine_distance_vec(start_lat, start_lon, lats, lons)
+                current_idx = int(np.argmin(distances))
+                self.logger.debug(f"First customer is {distances[current_idx]:.2f} km from starting location")
             else:
                 # Start from first location in dataset
                 current_idx = 0
 
-            current_location = unvisited.iloc[current_idx]
-            route.append(current_location)
-            unvisited = unvisited.drop(current_idx).reset_index(drop=True)
+            order = [current_idx]
+            visited[current_idx] = True
 
             # Build route using nearest neighbor with straight-line distance
-            while not unvisited.empty:
-                current_lat = current_location['latitude']
-                current_lon = current_location['longitude']
-
-                # Find nearest unvisited location using Haversine distance
-                distances = []
-                for _, row in unvisited.iterrows():
-                    dist = self.haversine_distance(current_lat, current_lon, row['latitude'], row['longitude'])
-                    distances.append(dist)
-
-                nearest_idx = np.argmin(distances)
-                current_location = unvisited.iloc[nearest_idx]
-                route.append(current_location)
-                unvisited = unvisited.drop(unvisited.index[nearest_idx]).reset_index(drop=True)
+            for _ in range(n - 1):
+                row = np.where(visited, np.inf, dist_matrix[current_idx])
+                current_idx = int(row.argmin())
+                order.append(current_idx)
+                visited[current_idx] = True
+
+            if self.two_opt_passes > 0 and n > 2:
+                start_distances = distances if start_lat is not None and start_lon is not None else None
+                order, saved_km = self.improve_route_two_opt(order, dist_matrix, start_distances)
+                if saved_km > 0:
+                    self.logger.debug(f"2-opt shortened route by {saved_km:.2f} km")
 
             # Create result dataframe with stop numbers
-            result_df = pd.DataFrame(route)
+            result_df = locations_df.iloc[order].reset_index(drop=True)
             result_df['stopno'] = range(1, len(result_df) + 1)
 
             return result_df
@@ -829,32 +1017,127 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             self.logger.error(f"Error in TSP optimization: {e}")
             return locations_df
 
-    def enrich_monthly_plan_data(self, db, distributor_id, agent_id, route_date):
+    def improve_route_two_opt(self, order, dist_matrix, start_distances=None):
+        """Improve a nearest-neighbor route with 2-opt segment reversals
+
+        The route is an open path: the first stop (or the starting location, when
+        given) stays fixed and there is no return leg. Each pass evaluates every
+        reversal for a segment start in one vectorized step and applies the best one.
+
+        Args:
+            order: List of location indices in visiting order
+            dist_matrix: N x N distance matrix (km)
+            start_distances: Distances from the starting location to each stop (optional)
+
+        Returns:
+            Tuple of (improved order, km saved)
         """
-        Enrich MonthlyRoutePlan_temp data with coordinates and addresses from customer table
+        n = len(order)
+        # Augmented matrix: optional start node at index n, zero-cost end node at n + 1,
+        # so both path ends are ordinary fixed nodes and every reversal has the same delta formula
+        augmented = np.zeros((n + 2, n + 2), dtype=dist_matrix.dtype)
+        augmented[:n, :n] = dist_matrix
+        if start_distances is not None:
+            augmented[n, :n] = start_distances
+            augmented[:n, n] = start_distances
+            path = np.array([n] + list(order) + [n + 1])
+        else:
+            path = np.array(list(order) + [n + 1])
+
+        saved_km = 0.0
+        for _ in range(self.two_opt_passes):
+            improved = False
+            for i in range(1, len(path) - 2):
+                js = np.arange(i + 1, len(path) - 1)
+                # Length change of reversing path[i..j]: replace edges (i-1, i) and (j, j+1)
+                # with (i-1, j) and (i, j+1)
+                deltas = (augmented[path[i - 1], path[js]] + augmented[path[i], path[js + 1]]
+                          - augmented[path[i - 1], path[i]] - augmented[path[js], path[js + 1]])
+                best = int(np.argmin(deltas))
+                if deltas[best] < -1e-6:  # ignore float32 rounding noise (~1 mm)
+                    j = js[best]
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    saved_km -= float(deltas[best])
+                    improved = True
+            if not improved:
+                break
+
+        improved_order = [int(idx) for idx in path if idx < n]
+        return improved_order, saved_km
+
+    def get_agent_monthly_plan(self, db, distributor_id, agent_id):
         """
-        try:
-            self.logger.info(f"Enriching data for Distributor: {distributor_id}, Agent: {agent_id}, Date: {route_date}")
+        Get MonthlyRoutePlan_temp rows for all dates of an agent in a single query
 
-            # Step 1: Get data from MonthlyRoutePlan_temp (IGNORE existing StopNo)
-            monthly_plan_query = f"""
+        Returns:
+            Dict mapping RouteDate -> DataFrame of that date's records,
+            or None if the query failed
+        """
+        try:
+            # Only per-row columns are fetched; DistributorID/AgentID are the filter
+            # values and are added client-side instead of being sent for every row
+            monthly_plan_query = """
             SELECT
                 CustNo, RouteDate, Name, WD, SalesManTerritory,
-                AgentID, RouteName, DistributorID, RouteCode,
-                SalesOfficeID
+                RouteName, RouteCode, SalesOfficeID
             FROM MonthlyRoutePlan_temp
-            WHERE DistributorID = '{distributor_id}'
-                AND AgentID = '{agent_id}'
-                AND RouteDate = '{route_date}'
+            WHERE DistributorID = ?
+                AND AgentID = ?
+                AND RouteDate IS NOT NULL
                 AND CustNo IS NOT NULL
             """
-            monthly_plan_df = db.execute_query_df(monthly_plan_query)
+            monthly_plan_df = db.execute_query_df(monthly_plan_query, params=(distributor_id, agent_id))
+
+            if monthly_plan_df is None:
+                return None
+
+            monthly_plan_df['AgentID'] = agent_id
+            monthly_plan_df['DistributorID'] = distributor_id
+
+            return {
+                route_date: date_df.reset_index(drop=True)
+                for route_date, date_df in monthly_plan_df.groupby('RouteDate', sort=False)
+            }
+
+        except Exception as e:
+            self.logger.error(f"Error fetching monthly plan for {distributor_id}/{agent_id}: {e}")
+            return None
+
+    def enrich_monthly_plan_data(self, db, distributor_id, agent_id, route_date, monthly_plan_df=None):
+        """
+        Enrich MonthlyRoutePlan_temp data with coordinates and addresses from customer table
+
+        Args:
+            monthly_plan_df: Pre-fetched MonthlyRoutePlan_temp rows for this date
+                (see get_agent_monthly_plan); queried here when None
+        """
+        try:
+            self.logger.debug(f"Enriching data for Distributor: {distributor_id}, Agent: {agent_id}, Date: {route_date}")
+
+            # Step 1: Get data from MonthlyRoutePlan_temp (IGNORE existing StopNo)
+            if monthly_plan_df is None:
+                monthly_plan_query = """
+                SELECT
+                    CustNo, RouteDate, Name, WD, SalesManTerritory,
+                    RouteName, RouteCode, SalesOfficeID
+                FROM MonthlyRoutePlan_temp
+                WHERE DistributorID = ?
+                    AND AgentID = ?
+                    AND RouteDate = ?
+                    AND CustNo IS NOT NULL
+                """
+                monthly_plan_df = db.execute_query_df(
+                    monthly_plan_query, params=(distributor_id, agent_id, str(route_date))
+                )
+                if monthly_plan_df is not None:
+                    monthly_plan_df['AgentID'] = agent_id
+                    monthly_plan_df['DistributorID'] = distributor_id
 
             if monthly_plan_df is None or monthly_plan_df.empty:
                 self.logger.warning(f"No data found in MonthlyRoutePlan_temp for {distributor_id}/{agent_id} on {route_date}")
                 return pd.DataFrame(), pd.DataFrame()
 
-            self.logger.info(f"Found {len(monthly_plan_df)} records in MonthlyRoutePlan_temp")
+            self.logger.debug(f"Found {len(monthly_plan_df)} records in MonthlyRoutePlan_temp")
 
             # Step 2: Get coordinates and barangay_code from customer table
             # Performance optimization: Use batch fetching with caching
@@ -862,7 +1145,7 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             customer_coords_df = self.get_customer_coordinates_batch(db, customer_nos_list)
 
             if customer_coords_df is not None and not customer_coords_df.empty:
-                self.logger.info(f"Found coordinates for {len(customer_coords_df)} customers (using cache)")
+                self.logger.debug(f"Found coordinates for {len(customer_coords_df)} customers (using cache)")
             else:
                 self.logger.warning("No customer coordinates found")
                 customer_coords_df = pd.DataFrame()
@@ -882,89 +1165,83 @@ class HierarchicalMonthlyRoutePipelineProcessor:
 
             # Step 4: Detect custype by checking source tables
             # OPTIMIZED: Use cache-aware custype detection
-            self.logger.info("Detecting custype from source tables...")
-
-            # Use cached custype lookups to avoid repeated queries
-            with self._cache_lock:
-                uncached_custnos = [cno for cno in monthly_plan_df['CustNo'] if cno not in getattr(self, '_custype_cache', {})]
-
-                if not hasattr(self, '_custype_cache'):
-                    self._custype_cache = {}
-
-            if uncached_custnos:
-                customer_nos = "', '".join([str(c) for c in uncached_custnos])
-
-                # OPTIMIZED: Single query with UNION ALL instead of 2 separate queries
-                combined_query = f"""
-                SELECT CustNo, 'customer' as custype FROM customer WHERE CustNo IN ('{customer_nos}')
-                UNION ALL
-                SELECT tdlinx as CustNo, 'prospect' as custype FROM prospective WHERE tdlinx IN ('{customer_nos}')
-                """
-                custype_results = db.execute_query_df(combined_query)
+            self.logger.debug("Detecting custype from source tables...")
 
-                # Cache results
-                with self._cache_lock:
-                    if custype_results is not None and not custype_results.empty:
-                        for _, row in custype_results.iterrows():
-                            self._custype_cache[row['CustNo']] = row['custype']
+            self.load_custypes(db, monthly_plan_df['CustNo'])
 
             # Apply cached custype
             enriched_df['custype'] = enriched_df['CustNo'].map(lambda x: self._custype_cache.get(x, 'unknown'))
 
             # Log custype distribution
             custype_counts = enriched_df['custype'].value_counts()
-            self.logger.info(f"Custype distribution: {custype_counts.to_dict()}")
+            self.logger.debug(f"Custype distribution: {custype_counts.to_dict()}")
 
             # Separate customers with and without coordinates
-            customers_with_coords = enriched_df[
+            # OPTIMIZED: Evaluate the coordinate predicate once; the two groups partition the frame
+            has_coords = (
                 (enriched_df['latitude'].notna()) &
                 (enriched_df['longitude'].notna()) &
                 (enriched_df['latitude'] != 0) &
                 (enriched_df['longitude'] != 0)
-            ].copy()
-
-            customers_without_coords = enriched_df[
-                (enriched_df['latitude'].isna()) |
-                (enriched_df['longitude'].isna()) |
-                (enriched_df['latitude'] == 0) |
-                (enriched_df['longitude'] == 0)
-            ].copy()
+            )
+            customers_with_coords = enriched_df[has_coords].copy()
+            customers_without_coords = enriched_df[~has_coords].copy()
 
-            self.logger.info(f"Customers with coordinates: {len(customers_with_coords)}")
-            self.logger.info(f"Customers without coordinates: {len(customers_without_coords)}")
+            self.logger.debug(f"Customers with coordinates: {len(customers_with_coords)}")
+            self.logger.debug(f"Customers without coordinates: {len(customers_without_coords)}")
 
-            # Step 5: Get prospects if needed (target 60 total)
+            # Step 5: Get prospects if needed (target min_route_size total)
             # SMART PROSPECT ADDITION: Only add prospects when customers have coordinates or address3
             # Do NOT add random prospects when no barangay information is available
             total_customers = len(enriched_df)
             prospects_df = pd.DataFrame()
 
-            if total_customers < 60:
-                needed_prospects = 60 - total_customers
-                self.logger.info(f"Need {needed_prospects} prospects to reach 60 total")
+            if total_customers < self.min_route_size:
+                needed_prospects = self.min_route_size - total_customers
+                self.logger.debug(f"Need {needed_prospects} prospects to reach {self.min_route_size} total")
 
                 # Get barangay codes from customers with coordinates, or use address3 from customer table
                 barangay_codes = []
                 if not customers_with_coords.empty:
                     # Use barangay codes from customers with coordinates
                     barangay_codes = customers_with_coords['barangay_code'].dropna().unique()
-                    self.logger.info(f"Found {len(barangay_codes)} barangay codes from customer coordinates")
+                    self.logger.debug(f"Found {len(barangay_codes)} barangay codes from customer coordinates")
                 elif not enriched_df.empty:
                     # No customers with coordinates - get address3 from customer table to match barangay_code
-                    self.logger.info("No customers with coordinates, getting address3 from customer table")
-                    customer_nos = "', '".join(enriched_df['CustNo'].astype(str))
-                    address3_query = f"""
-                    SELECT DISTINCT address3
-                    FROM customer
-                    WHERE CustNo IN ('{customer_nos}')
-                    AND address3 IS NOT NULL
-                    AND address3 != ''
-                    """
-                    address3_df = db.execute_query_df(address3_query)
+                    self.logger.debug("No customers with coordinates, getting address3 from customer table")
+                    route_custnos = enriched_df['CustNo'].astype(str).unique()
 
-                    if address3_df is not None and not address3_df.empty:
-                        barangay_codes = address3_df['address3'].dropna().unique()
-                        self.logger.info(f"Found {len(barangay_codes)} barangay codes from customer address3: {list(barangay_codes)[:5]}")
+                    # OPTIMIZED: Cache address3 per customer; the same customers recur on
+                    # many route dates, so only never-seen CustNos hit the database
+                    with self._cache_lock:
+                        uncached_custnos = [cno for cno in route_custnos if cno not in self._barangay_cache]
+
+                    if uncached_custnos:
+                        address3_query = """
+                        SELECT c.CustNo, c.address3
+                        FROM customer c
+                        INNER JOIN (VALUES {custno_values}) ids(CustNo)
+                            ON c.CustNo = CONVERT(VARCHAR(50), ids.CustNo)
+                        WHERE c.address3 IS NOT NULL
+                        AND c.address3 != ''
+                        """
+                        address3_df = self.query_by_custnos(db, address3_query, uncached_custnos)
+
+                        if address3_df is not None:
+                            found = {}
+                            if not address3_df.empty:
+                                found = dict(zip(address3_df['CustNo'].astype(str), address3_df['address3']))
+                            with self._cache_lock:
+                                # Customers without an address3 are cached as None too
+                                for cno in uncached_custnos:
+                                    self._barangay_cache[cno] = found.get(cno)
+
+                    with self._cache_lock:
+                        cached_address3 = [self._barangay_cache.get(cno) for cno in route_custnos]
+                    barangay_codes = pd.Series(cached_address3, dtype=object).dropna().unique()
+
+                    if len(barangay_codes) > 0:
+                        self.logger.debug(f"Found {len(barangay_codes)} barangay codes from customer address3: {list(barangay_codes)[:5]}")
 
                 # Build prospect query ONLY if we have valid barangay codes
                 if len(barangay_codes) > 0:
@@ -977,18 +1254,20 @@ class HierarchicalMonthlyRoutePipelineProcessor:
                     else:
                         # Use barangay codes from existing customers (either from coordinates or address3)
                         barangay_codes_str = "', '".join(valid_barangay_codes)
+                        barangay_placeholders = ", ".join("?" * len(valid_barangay_codes))
                         # OPTIMIZED: Use LEFT JOIN with IS NULL instead of NOT EXISTS for better performance
+                        # Values are bound as parameters so SQL Server can reuse the cached plan
                         prospect_query = f"""
-                        SELECT TOP {needed_prospects}
+                        SELECT TOP (?)
                             p.tdlinx as CustNo, p.latitude, p.longitude,
                             p.barangay_code, p.store_name_nielsen as Name
                         FROM prospective p
                         LEFT JOIN MonthlyRoutePlan_temp mrp ON mrp.CustNo = p.tdlinx
-                            AND mrp.DistributorID = '{distributor_id}'
-                            AND mrp.AgentID = '{agent_id}'
-                            AND mrp.RouteDate = CONVERT(DATE, '{route_date}')
+                            AND mrp.DistributorID = ?
+                            AND mrp.AgentID = ?
+                            AND mrp.RouteDate = CONVERT(DATE, ?)
                         LEFT JOIN custvisit cv ON cv.CustID = p.tdlinx
-                        WHERE p.barangay_code IN ('{barangay_codes_str}')
+                        WHERE p.barangay_code IN ({barangay_placeholders})
                         AND p.latitude IS NOT NULL
                         AND p.longitude IS NOT NULL
                         AND p.latitude != 0
@@ -997,9 +1276,13 @@ class HierarchicalMonthlyRoutePipelineProcessor:
                         AND cv.CustID IS NULL
                         ORDER BY NEWID()
                         """
-                        self.logger.info(f"Searching prospects in barangays: {barangay_codes_str[:100]}...")
+                        self.logger.debug(f"Searching prospects in barangays: {barangay_codes_str[:100]}...")
 
-                        prospects_df = db.execute_query_df(prospect_query)
+                        prospect_params = (
+                            int(needed_prospects), distributor_id, agent_id, str(route_date),
+                            *valid_barangay_codes
+                        )
+                        prospects_df = db.execute_query_df(prospect_query, params=prospect_params)
 
                         # Log if barangay search returns insufficient prospects
                         # NOTE: Location-based fallback will be executed later, after all agents are processed
@@ -1058,130 +1341,9 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             self.logger.error(f"Error enriching monthly plan data: {e}")
             return pd.DataFrame(), pd.DataFrame()
 
-    def process_single_combination(self, distributor_id, agent_id, date_info):
-        """Process a single distributor-agent-date combination"""
-        route_date = date_info['RouteDate']
-        customer_count = date_info['customer_count']
-
-        try:
-            self.logger.info(f"Processing: Distributor {distributor_id} -> Agent {agent_id} -> Date {route_date} ({customer_count} customers)")
-
-            # Step 1: Check scenario conditions
-            should_process, scenario_info = self.check_scenario_conditions(distributor_id, agent_id, route_date, customer_count)
-
-            if not should_process:
-                self.logger.info(f"Skipping based on scenario conditions: {scenario_info.get('scenario', 'unknown')}")
-                return {"status": "skipped", "reason": "scenario_conditions", "scenario": scenario_info}
-
-            # Step 2: Get database connection
-            db = DatabaseConnection()
-            db.connect()
-
-            try:
-                # Step 3: Enrich data with coordinates and prospects
-                all_data_for_tsp, customers_without_coords = self.enrich_monthly_plan_data(db, distributor_id, agent_id, route_date)
-
-                # Step 4: Apply TSP optimization (only if there's data with coordinates)
-                if not all_data_for_tsp.empty:
-                    self.logger.info(f"Applying TSP optimization to {len(all_data_for_tsp)} locations")
-                    optimized_data = self.solve_tsp_nearest_neighbor(all_data_for_tsp)
-                    self.logger.info(f"TSP optimized {len(optimized_data)} locations")
-                else:
-                    self.logger.info("No customers with coordinates - skipping TSP optimization")
-                    optimized_data = pd.DataFrame()
-
-                # Step 5: Combine optimized data with customers without coordinates
-                if not optimized_data.empty and not customers_without_coords.empty:
-                    all_final_data = pd.concat([optimized_data, customers_without_coords], ignore_index=True)
-                elif not optimized_data.empty:
-                    all_final_data = optimized_data
-                elif not customers_without_coords.empty:
-                    all_final_data = customers_without_coords
-                else:
-                    self.logger.warning(f"No data found for {distributor_id}/{agent_id} on {route_date}")
-                    return {"status": "no_data", "distributor": distributor_id, "agent": agent_id, "date": route_date}
-
-                # Step 6: Update MonthlyRoutePlan_temp with new StopNo values
-                updates_count = 0
-
-                # Add custype column if it doesn't exist
-                try:
-                    db.execute_query("ALTER TABLE MonthlyRoutePlan_temp ADD custype VARCHAR(20)")
-                    self.logger.info("Added custype column to MonthlyRoutePlan_temp")
-                except:
-                    pass  # Column may already exist
-
-                for _, row in all_final_data.iterrows():
-                    try:
-                        # Determine new stop number with proper NaN handling
-                        new_stop_no = None
-
-                        if 'stopno' in row and pd.notna(row['stopno']) and not pd.isna(row['stopno']):
-                            # From TSP optimization
-                            new_stop_no = row['stopno']
-                        elif 'new_stopno' in row and pd.notna(row['new_stopno']) and not pd.isna(row['new_stopno']):
-                            # For customers without coordinates
-                            new_stop_no = row['new_stopno']
-                        else:
-                            # Default case for customers without coordinates
-                            new_stop_no = 100
-                            self.logger.warning(f"No valid stopno found for {row['CustNo']}, defaulting to 100")
-
-                        # Ensure new_stop_no is a valid integer
-                        try:
-                            if new_stop_no is None or pd.isna(new_stop_no):
-                                new_stop_no = 100
-                            new_stop_no = int(float(new_stop_no))  # Convert via float first to handle edge cases
-                        except (ValueError, TypeError) as e:
-                            self.logger.warning(f"Invalid stopno value for {row['CustNo']}: {new_stop_no}, using 100")
-                            new_stop_no = 100
-
-                        custype = row.get('custype', 'customer')
-
-                        # Update query (without custype since column may not exist)
-                        update_query = """
-                        UPDATE MonthlyRoutePlan_temp
-                        SET StopNo = ?
-                        WHERE DistributorID = ? AND AgentID = ? AND RouteDate = ? AND CustNo = ?
-                        """
-
-                        db.execute_query(update_query, (
-                            new_stop_no, distributor_id, agent_id, route_date, row['CustNo']
-                        ))
-                        updates_count += 1
-
-                    except Exception as e:
-                        self.logger.error(f"Error updating record for CustNo {row['CustNo']}: {e}")
-                        continue
-
-                self.logger.info(f"Successfully updated {updates_count} records in MonthlyRoutePlan_temp")
-
-                return {
-                    "status": "success",
-                    "distributor": distributor_id,
-                    "agent": agent_id,
-                    "date": route_date,
-                    "records_updated": updates_count,
-                    "total_records": len(all_final_data),
-                    "scenario": scenario_info
-                }
-
-            finally:
-                db.close()
-
-        except Exception as e:
-            self.logger.error(f"Error processing {distributor_id}/{agent_id} on {route_date}: {e}")
-            return {
-                "status": "error",
-                "distributor": distributor_id,
-                "agent": agent_id,
-                "date": route_date,
-                "error": str(e)
-            }
-
     def fill_gaps_with_nearby_prospects(self, db):
         """
-        POST-PROCESSING: Fill gaps with nearby prospects for agents with < 60 customers
+        POST-PROCESSING: Fill gaps with nearby prospects for agents with < min_route_size customers
         This runs AFTER all agents have been processed to avoid conflicts
         """
         try:
@@ -1189,57 +1351,106 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             self.logger.info("POST-PROCESSING: Filling gaps with nearby prospects")
             self.logger.info("="*80)
 
-            # Find all distributor/agent/date combinations with < 60 customers
+            # Find all distributor/agent/date combinations with < min_route_size customers
+            # (threshold bound as a parameter so the statement text, and its cached plan, is stable)
+            # OPTIMIZED: One aggregation pass returns every gap route together with its
+            # route details and its customers' coordinates:
+            #   - the distinct count is computed once per route (route_counts CTE) and
+            #     filtered with WHERE instead of being repeated in SELECT and HAVING
+            #   - route details (WD, territory, route, sales office) come from one existing
+            #     record per gap route (OUTER APPLY TOP 1, an index seek per gap) instead of
+            #     a separate TOP 1 query round-trip per gap
+            #   - customers with valid coordinates are LEFT JOINed in, so routes without
+            #     any still appear (with NULL CustNo) and no second gap query is needed
             gap_query = """
+            WITH route_counts AS (
+                SELECT
+                    DistributorID,
+                    AgentID,
+                    RouteDate,
+                    COUNT(DISTINCT CustNo) as customer_count
+                FROM MonthlyRoutePlan_temp
+                GROUP BY DistributorID, AgentID, RouteDate
+            ),
+            gaps AS (
+                SELECT DistributorID, AgentID, RouteDate, customer_count
+                FROM route_counts
+                WHERE customer_count < ?
+            )
             SELECT
-                DistributorID,
-                AgentID,
-                RouteDate,
-                COUNT(DISTINCT CustNo) as customer_count
-            FROM MonthlyRoutePlan_temp
-            GROUP BY DistributorID, AgentID, RouteDate
-            HAVING COUNT(DISTINCT CustNo) < 60
-            ORDER BY DistributorID, AgentID, RouteDate
+                g.DistributorID,
+                g.AgentID,
+                g.RouteDate,
+                g.customer_count,
+                d.WD,
+                d.SalesManTerritory,
+                d.RouteName,
+                d.RouteCode,
+                d.SalesOfficeID,
+                m.CustNo,
+                c.latitude,
+                c.longitude
+            FROM gaps g
+            OUTER APPLY (
+                SELECT TOP 1
+                    WD, SalesManTerritory, RouteName, RouteCode, SalesOfficeID
+                FROM MonthlyRoutePlan_temp r
+                WHERE r.DistributorID = g.DistributorID
+                    AND r.AgentID = g.AgentID
+                    AND r.RouteDate = g.RouteDate
+            ) d
+            LEFT JOIN (
+                MonthlyRoutePlan_temp m
+                INNER JOIN customer c ON m.CustNo = c.CustNo
+                    AND c.latitude IS NOT NULL
+                    AND c.longitude IS NOT NULL
+                    AND c.latitude != 0
+                    AND c.longitude != 0
+            ) ON m.DistributorID = g.DistributorID
+                AND m.AgentID = g.AgentID
+                AND m.RouteDate = g.RouteDate
+            ORDER BY g.DistributorID, g.AgentID, g.RouteDate
             """
-            gaps_df = db.execute_query_df(gap_query)
+            gap_rows_df = db.execute_query_df(gap_query, params=(self.min_route_size,))
 
-            if gaps_df is None or gaps_df.empty:
-                self.logger.info("No gaps found - all routes have 60+ customers")
+            if gap_rows_df is None or gap_rows_df.empty:
+                self.logger.info(f"No gaps found - all routes have {self.min_route_size}+ customers")
                 return
 
-            self.logger.info(f"Found {len(gaps_df)} routes with < 60 customers")
+            # Split the combined result: one row per gap route, plus coordinates per route
+            route_key_columns = ['DistributorID', 'AgentID', 'RouteDate']
+            gaps_df = gap_rows_df.drop_duplicates(subset=route_key_columns).drop(
+                columns=['CustNo', 'latitude', 'longitude']
+            ).reset_index(drop=True)
+
+            self.logger.info(f"Found {len(gaps_df)} routes with < {self.min_route_size} customers")
+
+            coords_by_route = {}
+            gap_coords_df = gap_rows_df.dropna(subset=['CustNo'])
+            if not gap_coords_df.empty:
+                for route_key, route_coords in gap_coords_df.groupby(route_key_columns, sort=False):
+                    coords_by_route[route_key] = route_coords[['CustNo', 'latitude', 'longitude']]
 
             # Process each gap
-            for _, gap_row in gaps_df.iterrows():
-                distributor_id = gap_row['DistributorID']
-                agent_id = gap_row['AgentID']
-                route_date = gap_row['RouteDate']
-                current_count = gap_row['customer_count']
-                needed_prospects = 60 - current_count
+            # itertuples() yields lightweight namedtuples instead of boxing a Series per row
+            for gap_row in gaps_df.itertuples(index=False):
+                distributor_id = gap_row.DistributorID
+                agent_id = gap_row.AgentID
+                route_date = gap_row.RouteDate
+                current_count = gap_row.customer_count
+                needed_prospects = self.min_route_size - current_count
 
                 self.logger.info(f"\nProcessing gap: {distributor_id}/{agent_id}/{route_date} - needs {needed_prospects} prospects")
 
                 # Get customers with coordinates for this route
-                customer_coords_query = f"""
-                SELECT m.CustNo, c.latitude, c.longitude
-                FROM MonthlyRoutePlan_temp m
-                INNER JOIN customer c ON m.CustNo = c.CustNo
-                WHERE m.DistributorID = '{distributor_id}'
-                    AND m.AgentID = '{agent_id}'
-                    AND m.RouteDate = '{route_date}'
-                    AND c.latitude IS NOT NULL
-                    AND c.longitude IS NOT NULL
-                    AND c.latitude != 0
-                    AND c.longitude != 0
-                """
-                customers_with_coords = db.execute_query_df(customer_coords_query)
+                customers_with_coords = coords_by_route.get((distributor_id, agent_id, route_date))
 
                 if customers_with_coords is None or customers_with_coords.empty:
                     self.logger.warning(f"No customers with coordinates for location-based search - skipping")
                     continue
 
                 # Search for nearby prospects
-                self.logger.info(f"Searching for {needed_prospects} nearby prospects...")
+                self.logger.debug(f"Searching for {needed_prospects} nearby prospects...")
                 nearby_prospects = self.find_nearby_prospects_by_location(
                     db, distributor_id, agent_id, route_date,
                     customers_with_coords, needed_prospects, max_distance_km=5.0
@@ -1252,30 +1463,16 @@ class HierarchicalMonthlyRoutePipelineProcessor:
                 # Insert the prospects into MonthlyRoutePlan_temp
                 self.logger.info(f"Found {len(nearby_prospects)} nearby prospects - inserting into route plan")
 
-                # Get route details from existing records
-                route_details_query = f"""
-                SELECT TOP 1 WD, SalesManTerritory, RouteName, RouteCode, SalesOfficeID
-                FROM MonthlyRoutePlan_temp
-                WHERE DistributorID = '{distributor_id}'
-                    AND AgentID = '{agent_id}'
-                    AND RouteDate = '{route_date}'
-                """
-                route_details = db.execute_query_df(route_details_query)
-
-                if route_details is not None and not route_details.empty:
-                    wd = route_details['WD'].iloc[0] if 'WD' in route_details.columns else 1
-                    territory = route_details['SalesManTerritory'].iloc[0] if 'SalesManTerritory' in route_details.columns else ''
-                    route_name = route_details['RouteName'].iloc[0] if 'RouteName' in route_details.columns else ''
-                    route_code = route_details['RouteCode'].iloc[0] if 'RouteCode' in route_details.columns else ''
-                    sales_office = route_details['SalesOfficeID'].iloc[0] if 'SalesOfficeID' in route_details.columns else ''
-                else:
-                    wd = 1
-                    territory = route_name = route_code = sales_office = ''
+                # Route details from an existing record (fetched with the gap query)
+                wd = gap_row.WD
+                territory = gap_row.SalesManTerritory
+                route_name = gap_row.RouteName
+                route_code = gap_row.RouteCode
+                sales_office = gap_row.SalesOfficeID
 
                 # Insert prospects
                 connection = db.connection
-                cursor = connection.cursor()
-                insert_count = 0
+                cursor = db.bulk_cursor()  # fast_executemany: whole batch in one round-trip
 
                 try:
                     insert_query = """
@@ -1284,21 +1481,25 @@ class HierarchicalMonthlyRoutePipelineProcessor:
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """
 
-                    for _, prospect in nearby_prospects.iterrows():
-                        cursor.execute(insert_query, (
-                            str(distributor_id)[:50],
-                            str(agent_id)[:50],
-                            str(route_date),
-                            str(prospect['CustNo'])[:50],
-                            1,  # Will be re-optimized with TSP
-                            str(prospect.get('Name', ''))[:50],  # Truncate to avoid SQL error
-                            int(wd) if pd.notna(wd) else 1,
-                            str(territory)[:50],
-                            str(route_name)[:50],
-                            str(route_code)[:50],
-                            str(sales_office)[:50]
-                        ))
-                        insert_count += 1
+                    # Route-level values are the same for every inserted prospect
+                    route_values_head = (str(distributor_id)[:50], str(agent_id)[:50], str(route_date))
+                    route_values_tail = (
+                        int(wd) if pd.notna(wd) else 1,
+                        str(territory)[:50],
+                        str(route_name)[:50],
+                        str(route_code)[:50],
+                        str(sales_office)[:50]
+                    )
+
+                    # OPTIMIZED: Build all parameter rows up front and send them with a single
+                    # executemany() instead of one cursor.execute() round-trip per prospect
+                    # (StopNo 1 is a placeholder - re-optimized with TSP; Name truncated to avoid SQL error)
+                    insert_params = [
+                        route_values_head + (str(prospect_custno)[:50], 1, str(prospect_name)[:50]) + route_values_tail
+                        for prospect_custno, prospect_name in zip(nearby_prospects['CustNo'], nearby_prospects['Name'])
+                    ]
+                    cursor.executemany(insert_query, insert_params)
+                    insert_count = len(insert_params)
 
                     connection.commit()
                     self.logger.info(f"Successfully inserted {insert_count} nearby prospects")
@@ -1323,47 +1524,46 @@ class HierarchicalMonthlyRoutePipelineProcessor:
         try:
             self.logger.info("Starting custype update using JOIN...")
 
-            # Update custype for customers
-            update_customer_query = """
-            UPDATE MonthlyRoutePlan_temp
-            SET custype = 'customer'
-            FROM MonthlyRoutePlan_temp m
-            INNER JOIN customer c ON m.CustNo = c.CustNo
-            WHERE m.custype IS NULL OR m.custype = ''
-            """
-            try:
-                db.execute_query(update_customer_query)
-            except Exception as e:
-                # Ignore "No results" error for UPDATE queries
-                if "No results" not in str(e):
-                    raise
-            self.logger.info("Updated custype for customers")
-
-            # Update custype for prospects
-            update_prospect_query = """
-            UPDATE MonthlyRoutePlan_temp
-            SET custype = 'prospect'
+            # OPTIMIZED: One batch (single round-trip) tags customers and prospects in a
+            # single UPDATE pass and returns the unknown count; customer wins when a
+            # CustNo exists in both source tables
+            custype_batch_query = """
+            SET NOCOUNT ON;
+
+            UPDATE m
+            SET custype = CASE
+                WHEN EXISTS (SELECT 1 FROM customer c WHERE c.CustNo = m.CustNo) THEN 'customer'
+                ELSE 'prospect'
+            END
             FROM MonthlyRoutePlan_temp m
-            INNER JOIN prospective p ON m.CustNo = p.tdlinx
-            WHERE m.custype IS NULL OR m.custype = ''
-            """
-            try:
-                db.execute_query(update_prospect_query)
-            except Exception as e:
-                # Ignore "No results" error for UPDATE queries
-                if "No results" not in str(e):
-                    raise
-            self.logger.info("Updated custype for prospects")
+            WHERE (m.custype IS NULL OR m.custype = '')
+                AND (
+                    EXISTS (SELECT 1 FROM customer c WHERE c.CustNo = m.CustNo)
+                    OR EXISTS (SELECT 1 FROM prospective p WHERE p.tdlinx = m.CustNo)
+                );
 
-            # Check for any unknown custype
-            check_query = """
             SELECT COUNT(*) as unknown_count
             FROM MonthlyRoutePlan_temp
-            WHERE custype IS NULL OR custype = '' OR custype = 'unknown'
+            WHERE custype IS NULL OR custype = '' OR custype = 'unknown';
             """
-            result = db.execute_query(check_query)
-            if result and result[0][0] > 0:
-                self.logger.warning(f"Found {result[0][0]} records with unknown custype")
+
+            connection = db.connection
+            cursor = connection.cursor()
+            try:
+                cursor.execute(custype_batch_query)
+                unknown_count = cursor.fetchone()[0]
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+            self.logger.info("Updated custype for customers and prospects")
+
+            # Check for any unknown custype
+            if unknown_count > 0:
+                self.logger.warning(f"Found {unknown_count} records with unknown custype")
             else:
                 self.logger.info("All records have valid custype")
 
@@ -1373,6 +1573,7 @@ class HierarchicalMonthlyRoutePipelineProcessor:
     def run_hierarchical_pipeline(self, parallel=False):
         """Run the hierarchical monthly route pipeline"""
         self.start_time = time.time()
+        self._last_progress_report = 0
         self.logger.info("=" * 80)
         self.logger.info("STARTING HIERARCHICAL MONTHLY ROUTE PLAN PIPELINE")
         self.logger.info("Processing Order: DistributorID -> SalesAgent -> Date (chronological)")
@@ -1380,6 +1581,7 @@ class HierarchicalMonthlyRoutePipelineProcessor:
         self.logger.info("=" * 80)
 
         db = None
+        executor = None
         try:
             # Get database connection
             db = DatabaseConnection()
@@ -1404,6 +1606,11 @@ class HierarchicalMonthlyRoutePipelineProcessor:
 
             self.logger.info(f"Total combinations to process: {total_combinations}")
 
+            # One worker pool for the whole run, so worker threads (and their
+            # database connections) are reused across distributors
+            if parallel:
+                executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
             # Process hierarchy: DistributorID -> SalesAgent -> Date (with sequential StopNo per agent)
             # PERFORMANCE OPTIMIZATION: Parallel agent processing within each distributor
             for distributor_id, agents in hierarchy.items():
@@ -1415,49 +1622,39 @@ class HierarchicalMonthlyRoutePipelineProcessor:
                     # PARALLEL MODE: Process multiple agents concurrently
                     self.logger.info(f"Using PARALLEL processing with {self.max_workers} workers for {len(agents)} agents")
 
-                    with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                        # Submit all agents for this distributor to thread pool
-                        future_to_agent = {}
-                        for agent_id, dates in agents.items():
-                            self.logger.info(f"Submitting Agent {agent_id} to thread pool ({len(dates)} dates)")
-                            future = executor.submit(
-                                self.process_agent_parallel_wrapper,
-                                distributor_id, agent_id, dates
-                            )
-                            future_to_agent[future] = agent_id
-
-                        # Collect results as agents complete
-                        for future in as_completed(future_to_agent):
-                            agent_id = future_to_agent[future]
-                            try:
-                                agent_results = future.result()
-                                results.extend(agent_results)
-
-                                # Thread-safe progress update
-                                with self._progress_lock:
-                                    for result in agent_results:
-                                        processed_combinations += 1
-                                        if result['status'] == 'success':
-                                            self.processed_count += 1
-                                        elif result['status'] == 'error':
-                                            self.error_count += 1
-
-                                    # Performance optimization: Enhanced progress tracking with ETA
-                                    progress_pct = (processed_combinations / total_combinations) * 100
-                                    elapsed_time = time.time() - self.start_time
-                                    avg_time_per_combo = elapsed_time / processed_combinations if processed_combinations > 0 else 0
-                                    remaining_combos = total_combinations - processed_combinations
-                                    eta_seconds = avg_time_per_combo * remaining_combos
-                                    eta_minutes = eta_seconds / 60
-
-                                    self.logger.info(f"Agent {agent_id} completed | Progress: {processed_combinations}/{total_combinations} ({progress_pct:.1f}%) | "
-                                                   f"ETA: {eta_minutes:.1f} min | "
-                                                   f"Rate: {1/avg_time_per_combo if avg_time_per_combo > 0 else 0:.2f} combos/sec")
-
-                            except Exception as e:
-                                self.logger.error(f"Agent {agent_id} failed with error: {e}")
-                                with self._progress_lock:
-                                    self.error_count += 1
+                    # Submit all agents for this distributor to thread pool
+                    future_to_agent = {}
+                    for agent_id, dates in agents.items():
+                        self.logger.info(f"Submitting Agent {agent_id} to thread pool ({len(dates)} dates)")
+                        future = executor.submit(
+                            self.process_agent_parallel_wrapper,
+                            distributor_id, agent_id, dates
+                        )
+                        future_to_agent[future] = agent_id
+
+                    # Collect results as agents complete
+                    for future in as_completed(future_to_agent):
+                        agent_id = future_to_agent[future]
+                        try:
+                            agent_results = future.result()
+                            results.extend(agent_results)
+
+                            # Thread-safe progress update
+                            with self._progress_lock:
+                                for result in agent_results:
+                                    processed_combinations += 1
+                                    if result['status'] == 'success':
+                                        self.processed_count += 1
+                                    elif result['status'] == 'error':
+                                        self.error_count += 1
+
+                                self.log_progress(processed_combinations, total_combinations,
+                                                  prefix=f"Agent {agent_id} completed | ")
+
+                        except Exception as e:
+                            self.logger.error(f"Agent {agent_id} failed with error: {e}")
+                            with self._progress_lock:
+                                self.error_count += 1
 
                 else:
                     # SEQUENTIAL MODE: Process agents one at a time (original behavior)
@@ -1478,17 +1675,12 @@ class HierarchicalMonthlyRoutePipelineProcessor:
                             elif result['status'] == 'error':
                                 self.error_count += 1
 
-                        # Performance optimization: Enhanced progress tracking with ETA
-                        progress_pct = (processed_combinations / total_combinations) * 100
-                        elapsed_time = time.time() - self.start_time
-                        avg_time_per_combo = elapsed_time / processed_combinations if processed_combinations > 0 else 0
-                        remaining_combos = total_combinations - processed_combinations
-                        eta_seconds = avg_time_per_combo * remaining_combos
-                        eta_minutes = eta_seconds / 60
+                        self.log_progress(processed_combinations, total_combinations)
 
-                        self.logger.info(f"Progress: {processed_combinations}/{total_combinations} ({progress_pct:.1f}%) | "
-                                       f"ETA: {eta_minutes:.1f} min | "
-                                       f"Rate: {1/avg_time_per_combo if avg_time_per_combo > 0 else 0:.2f} combos/sec")
+            # Release worker threads and their connections before post-processing
+            if executor:
+                executor.shutdown(wait=True)
+            self.close_thread_connections()
 
             # POST-PROCESSING: Fill gaps with nearby prospects (executed last to avoid conflicts)
             self.logger.info("\nStarting post-processing phase...")
@@ -1507,17 +1699,47 @@ class HierarchicalMonthlyRoutePipelineProcessor:
             traceback.print_exc()
 
         finally:
+            if executor:
+                executor.shutdown(wait=True)
+            self.close_thread_connections()
             if db:
                 db.close()
 
+    def log_progress(self, processed_combinations, total_combinations, prefix=""):
+        """Log progress with ETA every `progress_interval` combinations (and on completion)
+
+        Args:
+            processed_combinations: Number of combinations processed so far
+            total_combinations: Total number of combinations in this run
+            prefix: Optional text prepended to the progress message
+        """
+        if (processed_combinations - self._last_progress_report < self.progress_interval
+                and processed_combinations < total_combinations):
+            return
+        self._last_progress_report = processed_combinations
+
+        # Performance optimization: Enhanced progress tracking with ETA
+        progress_pct = (processed_combinations / total_combinations) * 100
+        elapsed_time = time.time() - self.start_time
+        avg_time_per_combo = elapsed_time / processed_combinations if processed_combinations > 0 else 0
+        remaining_combos = total_combinations - processed_combinations
+        eta_seconds = avg_time_per_combo * remaining_combos
+        eta_minutes = eta_seconds / 60
+
+        self.logger.info(f"{prefix}Progress: {processed_combinations}/{total_combinations} ({progress_pct:.1f}%) | "
+                         f"ETA: {eta_minutes:.1f} min | "
+                         f"Rate: {1/avg_time_per_combo if avg_time_per_combo > 0 else 0:.2f} combos/sec")
+
     def print_final_summary(self, results, total_combinations):
         """Print final processing summary"""
         end_time = time.time()
         duration = end_time - self.start_time
 
-        success_count = len([r for r in results if r['status'] == 'success'])
-        error_count = len([r for r in results if r['status'] == 'error'])
-        skipped_count = len([r for r in results if r['status'] == 'skipped'])
+        # Single pass over results instead of one list comprehension per status
+        status_counts = Counter(r['status'] for r in results)
+        success_count = status_counts['success']
+        error_count = status_counts['error']
+        skipped_count = status_counts['skipped']
 
         self.logger.info("\n" + "="*80)
         self.logger.info("HIERARCHICAL MONTHLY ROUTE PIPELINE COMPLETED!")